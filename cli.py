@@ -1,11 +1,14 @@
 import os
 import engine
-import pandas as pd
-from io import StringIO
+import exporter
+import numpy as np
 from tabulate import tabulate
-from datetime import datetime
 
 DIVIDER_LENGTH = 80
+PAGE_SIZE = 20
+
+# Exports stay plain CSV unless another format is chosen
+DEFAULT_EXPORT_FORMAT = 'csv'
 
 
 def welcome(submissions_path):
@@ -51,7 +54,7 @@ def select_submission_directory(submissions_path):
         elif 0 < user_choice <= file_count: break
         else: print('Incorrect choice!\nKindly select from the options 0, to {filecount} given above.')
 
-    return filenames[user_choice - 1], submissions_path + filenames[user_choice - 1] + '\\'
+    return filenames[user_choice - 1], os.path.join(submissions_path, filenames[user_choice - 1])
 
 
 def take_custom_path():
@@ -108,13 +111,14 @@ def select_initial_action(submission_directory_path):
     print('0) Go back')
     print('1) Generate plagiarism report for all files')
     print('2) Generate plagiarism report for a specific file')
+    print('3) Compare reports across noise thresholds and window sizes')
 
     while True:
         print('Enter your choice:', end=' ')
         user_choice = input()
 
-        if user_choice in ['0', '1', '2']: break
-        else: print('Incorrect choice!\nKindly select from the options 0, 1, or 2 given above.')
+        if user_choice in ['0', '1', '2', '3']: break
+        else: print('Incorrect choice!\nKindly select from the options 0, 1, 2, or 3 given above.')
 
     return user_choice
 
@@ -125,6 +129,10 @@ def display_insights(insights, is_file_specific=False):
     print(f"Minimum Plagiarism: {insights['min']}%")
     print(f"Mean: {insights['mean']}%")
     print(f"Standard Deviation: {insights['std']}")
+
+    if insights.get('duplicate_groups'):
+        duplicate_groups = insights['duplicate_groups']
+        print(f"Identical Submissions: {sum(len(members) for members in duplicate_groups)} files in {len(duplicate_groups)} groups")
     
     if is_file_specific:
         print(f"Originality Score: {insights['originality_score']}")
@@ -144,14 +152,20 @@ def display_group_insights(group_insights):
     return
 
 
-def select_ensuing_action(submission_directory_path):
+def select_ensuing_action(submission_directory_path, top_k=None):
     print('-' * DIVIDER_LENGTH)
     print('>>>>> Select a follow-up task <<<<<')
     print('-' * DIVIDER_LENGTH)
+
+    # Only the best matches were kept when the comprehensive list did not fit in memory
+    if top_k:
+        print(f'Only the top {top_k} matches of each file were kept, as the comprehensive list of logs does not fit in memory.')
+        print('To export every pair, generate the report again and export the logs while the files are compared.')
+
     print('Select an option to proceed:')
     print('0) Go back')
     print('1) Export the above plagiarism report')
-    print('2) Export a comprehensive list of logs')
+    print(f'2) Export the top {top_k} matches of each file' if top_k else '2) Export a comprehensive list of logs')
     print('3) Identify groups of plagiarised submissions')
 
     while True:
@@ -183,24 +197,119 @@ def select_group_action():
     return user_choice
 
 
-def export_report(results_path, report, filename):
+def select_export_format():
+    export_formats = exporter.available_formats()
+
+    print('-' * DIVIDER_LENGTH)
+    print('Select an export format:')
+    for i in range(len(export_formats)):
+        print(f'{i+1}) {export_formats[i]}')
+
+    while True:
+        print(f'Enter your choice (press Enter for {DEFAULT_EXPORT_FORMAT}):', end=' ')
+        user_choice = input().strip()
+
+        if not user_choice: return DEFAULT_EXPORT_FORMAT
+        elif user_choice in [str(i+1) for i in range(len(export_formats))]: break
+        else: print(f'Incorrect choice!\nKindly select from the options 1 to {len(export_formats)} given above, or press Enter.')
+
+    return export_formats[int(user_choice) - 1]
+
+
+def select_log_streaming():
+    print('-' * DIVIDER_LENGTH)
+    print('Export the comprehensive list of logs while the files are compared?')
+    print('0) No')
+    print('1) Yes')
+
+    while True:
+        print('Enter your choice:', end=' ')
+        user_choice = input()
+
+        if user_choice in ['0', '1']: break
+        else: print('Incorrect choice!\nKindly select from the options 0, or 1 given above.')
+
+    return user_choice == '1'
+
+
+def export_report(results_path, report, filename, export_format=None):
     '''
     To export the data requested by the User
     '''
-    # Ensure the desired directory exists
-    if not os.path.exists(results_path):
-        os.mkdir(results_path)
+    export_format = export_format or select_export_format()
 
-    new_filename = f"{filename}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-    report.to_csv(f'{results_path}\\{new_filename}', index=False)
-    print(f'Successfully exported the file {new_filename} to {results_path}')
+    # Write the report in chunks to a timestamped file
+    export_path = exporter.export_path(results_path, filename, export_format)
+    exporter.export_frame(report, export_path, export_format)
+    print(f'Successfully exported the file {os.path.basename(export_path)} to {results_path}')
 
     return
 
 
-def display_report(report):
-    df = pd.read_table(StringIO(report.to_string(index=False)), sep="\s+", header=0)
-    print(tabulate(df, headers='keys', tablefmt='psql'))
+def filter_report_rows(report, threshold=None, file_query=None):
+    '''
+    To find the positions of the rows matching the given filters
+    '''
+    mask = np.ones(len(report), dtype=bool)
+
+    # Keep rows at or above the plagiarism threshold
+    score_columns = [column for column in report.columns if column.endswith('Plagiarism(%)')]
+    if threshold is not None and score_columns:
+        mask &= report[score_columns[0]].to_numpy(dtype=float) >= threshold
+
+    # Keep rows mentioning the given file
+    if file_query:
+        file_mask = np.zeros(len(report), dtype=bool)
+        for column in ['Submitted_Code', 'Source_Code']:
+            if column in report.columns:
+                file_mask |= report[column].astype(str).str.contains(file_query, regex=False).to_numpy()
+        mask &= file_mask
+
+    return np.flatnonzero(mask)
+
+
+def render_page(report, rows, page, page_size=PAGE_SIZE):
+    '''
+    To format a single page of rows straight from the report
+    '''
+    page_rows = report.iloc[rows[page * page_size:(page + 1) * page_size]]
+    return tabulate(page_rows.to_numpy().tolist(), headers=list(report.columns), tablefmt='psql', showindex=list(page_rows.index))
+
+
+def display_report(report, page_size=PAGE_SIZE):
+    threshold, file_query = None, None
+    rows = filter_report_rows(report)
+    page = 0
+
+    while True:
+        page_count = max(1, -(-len(rows) // page_size))
+        print(render_page(report, rows, page, page_size))
+        print(f'Page {page + 1} of {page_count} ({len(rows)} of {len(report)} rows)')
+
+        # A report that fits on one page needs no navigation
+        if len(report) <= page_size:
+            break
+
+        print('n) Next page, p) Previous page, t <value>) Plagiarism threshold, f <name>) Filter by file, c) Clear filters, Enter) Continue')
+        print('Enter your choice:', end=' ')
+        user_choice = input().strip()
+        command, _, argument = user_choice.partition(' ')
+
+        if not user_choice: break
+        elif command == 'n': page = min(page + 1, page_count - 1)
+        elif command == 'p': page = max(page - 1, 0)
+        elif command in ['t', 'f', 'c']:
+            try:
+                if command == 't': threshold = float(argument) if argument else None
+                elif command == 'f': file_query = argument.strip() or None
+                else: threshold, file_query = None, None
+            except ValueError:
+                print('Incorrect threshold!\nKindly enter a number such as t 80')
+                continue
+            rows = filter_report_rows(report, threshold, file_query)
+            page = 0
+        else: print('Incorrect choice!\nKindly select from the options n, p, t, f, c, or press Enter given above.')
+
     return
 
 
@@ -223,6 +332,46 @@ def select_file_follow_up():
     return user_choice
 
 
+def select_sweep_action():
+    print('-' * DIVIDER_LENGTH)
+    print('>>>>> Select a concluding task <<<<<')
+    print('-' * DIVIDER_LENGTH)
+    print('Select an option to proceed:')
+    print('0) Go back')
+    print('1) Export the above comparison of settings')
+    print('2) Generate plagiarism report for all files with one of the above settings')
+    print('3) Go to Home Page')
+
+    while True:
+        print('Enter your choice:', end=' ')
+        user_choice = input()
+
+        if user_choice in ['0', '1', '2', '3']: break
+        else: print('Incorrect choice!\nKindly select from the options 0, 1, 2, or 3 given above.')
+
+    return user_choice
+
+
+def select_sweep_setting(settings):
+    setting_count = len(settings)
+
+    print('-' * DIVIDER_LENGTH)
+    print('Select a setting for the plagiarism report:')
+    print('0) Go back')
+    for i in range(setting_count):
+        print(f'{i+1}) k = {settings[i][0]} and window size = {settings[i][1]}')
+
+    while True:
+        print('Enter your choice:', end=' ')
+        user_choice = int(input())
+
+        if not user_choice: return user_choice
+        elif 0 < user_choice <= setting_count: break
+        else: print(f'Incorrect choice!\nKindly select from the options 0, to {setting_count} given above.')
+
+    return settings[user_choice - 1]
+
+
 def select_final_action():
     print('-' * DIVIDER_LENGTH)
     print('>>>>> Select a concluding task <<<<<')
@@ -245,7 +394,9 @@ def select_final_action():
 def user_commands():
     flow = 'welcome'
     current_path = os.getcwd()
-    submissions_path = current_path + '\\submissions\\'
+    submissions_path = os.path.join(current_path, 'submissions')
+    # Fingerprinting settings chosen from a sweep, which the batch report then uses
+    moss_settings = {}
 
     while flow:
 
@@ -259,7 +410,7 @@ def user_commands():
         # Select a submission directory from default path
         elif flow == 'select_directory':
             chosen_directory, submission_directory_path = select_submission_directory(submissions_path)
-            results_path = current_path + '\\results\\' + chosen_directory
+            results_path = os.path.join(current_path, 'results', chosen_directory)
             if submission_directory_path == 0: flow = 'welcome'
             else: flow = 'select_initial_action'
 
@@ -267,16 +418,54 @@ def user_commands():
         elif flow == 'select_initial_action':
             initial_action_choice = select_initial_action(submission_directory_path)
             if initial_action_choice == '0': flow = 'select_directory'
-            elif initial_action_choice == '1': flow = 'generate_batch_report'
+            elif initial_action_choice == '1':
+                moss_settings = {}
+                flow = 'generate_batch_report'
             elif initial_action_choice == '2': flow = 'select_file'
+            elif initial_action_choice == '3': flow = 'generate_sweep_report'
 
         elif flow == 'generate_batch_report':
+            log_format = select_export_format() if select_log_streaming() else None
             print('-' * DIVIDER_LENGTH)
-            plagiarism_logs, batch_report, insights = engine.trigger_moss(submission_directory_path)
+
+            if log_format:
+                # Write the logs on a separate thread as the comparison produces them
+                log_path = exporter.export_path(results_path, 'exhaustive_logs', log_format)
+                with exporter.BackgroundWriter(exporter.ReportWriter(log_path, log_format)) as log_writer:
+                    plagiarism_logs, batch_report, insights = engine.trigger_moss(submission_directory_path, checkpoint_path=os.path.join(results_path, 'checkpoints'), log_writer=log_writer, keep_logs=False, **moss_settings)
+                print(f'Successfully exported the file {os.path.basename(log_path)} to {results_path}')
+            else:
+                plagiarism_logs, batch_report, insights = engine.trigger_moss(submission_directory_path, checkpoint_path=os.path.join(results_path, 'checkpoints'), **moss_settings)
             display_report(batch_report)
             display_insights(insights) 
             flow = 'select_ensuing_action'
 
+        elif flow == 'generate_sweep_report':
+            print('-' * DIVIDER_LENGTH)
+            sweep_report, sweep_results = engine.sweep_moss(submission_directory_path)
+            display_report(sweep_report)
+            flow = 'sweep_follow_up'
+
+        elif flow == 'sweep_follow_up':
+            sweep_action_choice = select_sweep_action()
+            if sweep_action_choice == '0': flow = 'select_initial_action'
+            elif sweep_action_choice == '1': flow = 'export_sweep_report'
+            elif sweep_action_choice == '2': flow = 'select_sweep_setting'
+            elif sweep_action_choice == '3': flow = 'welcome'
+
+        elif flow == 'export_sweep_report':
+            export_report(results_path, sweep_report, 'sweep_report')
+            flow = 'sweep_follow_up'
+
+        elif flow == 'select_sweep_setting':
+            sweep_setting = select_sweep_setting(list(sweep_results))
+            if sweep_setting == 0: flow = 'sweep_follow_up'
+            else:
+                # The sweep fingerprints with the rolling hash, so the report does too to reproduce its results
+                k, window_size = sweep_setting
+                moss_settings = {'k': k, 'window_size': window_size, 'rolling_hash': True}
+                flow = 'generate_batch_report'
+
         elif flow == 'select_file':
             specific_file_path = select_specific_file(submission_directory_path)
             if specific_file_path == 0: flow = 'select_directory'
@@ -289,7 +478,7 @@ def user_commands():
             flow = 'file_report_follow_up'
 
         elif flow == 'select_ensuing_action':
-            ensuing_action_choice = select_ensuing_action(submission_directory_path)
+            ensuing_action_choice = select_ensuing_action(submission_directory_path, insights['plan']['top_k'])
             if ensuing_action_choice == '0': flow = 'select_directory'
             elif ensuing_action_choice == '1': flow = 'export_plag_report'
             elif ensuing_action_choice == '2': flow = 'export_plag_logs'
@@ -300,12 +489,16 @@ def user_commands():
             flow = 'select_ensuing_action'
 
         elif flow == 'export_plag_logs':
-            export_report(results_path, plagiarism_logs, 'exhaustive_logs')
+            # Streamed logs are not kept in memory, as they were exported during the comparison
+            if plagiarism_logs is None:
+                print(f'The comprehensive list of logs was already exported as {os.path.basename(log_path)} to {results_path}')
+            else:
+                export_report(results_path, plagiarism_logs, 'top_k_logs' if insights['plan']['top_k'] else 'exhaustive_logs')
             flow = 'select_ensuing_action'
 
         # Receive a custom path
         elif flow == 'identify_groups':
-            group_logs, group_insights = engine.diagnose_clusters(batch_report)
+            group_logs, group_insights = engine.diagnose_clusters(batch_report, insights.get('duplicate_groups'))
             display_report(group_logs)
             display_group_insights(group_insights)
             flow = 'group_follow_up'
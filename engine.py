@@ -13,6 +13,42 @@ import pandas as pd
 import hashlib as hl
 from datetime import datetime
 
+# Creates scratch directories for tile checkpoints
+import tempfile
+
+# Splits the batch comparison into resumable tiles
+import tiling
+
+# Keeps the results as integer file IDs
+from results_model import PlagiarismResults, ResultsCollector
+
+# Picks the comparison strategy, workers and output mode
+import planner
+
+# Default noise threshold (k-gram length)
+NOISE_THRESHOLD = 9
+
+# Number of pairs streamed to the exported logs at a time
+LOG_CHUNK_PAIRS = 500_000
+
+# Number of pairs handed to the collector at a time, as many as a 256 x 256 tile holds
+COLLECT_CHUNK_PAIRS = 65_536
+
+# MinHash banding used to find candidate pairs (20 bands of 3 rows favour matches above ~35%)
+LSH_BANDS = 20
+LSH_ROWS = 3
+LSH_SEED = 23
+MERSENNE_PRIME = 2**31 - 1
+
+# Settings tried by the parameter sweep, where a window size of None is derived from the code length
+SWEEP_NOISE_THRESHOLDS = [7, 9, 11]
+SWEEP_WINDOW_SIZES = [None, 4, 8]
+ROLLING_HASH_BASE = 257
+
+# Bins of the best-match distribution reported for each sweep setting
+SCORE_BINS = [-1, 0, 10, 20, 30, 40, 50, 60, 70, 80, 90, 100]
+SCORE_BIN_LABELS = ['Blank'] + [f'{low}-{high}%' for low, high in zip(SCORE_BINS[1:-1], SCORE_BINS[2:])]
+
 
 def scan_and_return_text(filename):
   '''
@@ -99,7 +135,7 @@ def preprocess_code(path, filename):
   To pre-process the source code read from file and return a clean masked code
   '''
   # Read the text file
-  lines_of_code = scan_and_return_text(path + filename)
+  lines_of_code = scan_and_return_text(os.path.join(path, filename))
 
   # Extract all the user-defined variable names
   try:
@@ -226,17 +262,58 @@ def check_for_plagiarism(filename_1, filename_2, fingerprints_1, fingerprints_2,
   return result
 
 
-def preprocess_directory(path, filenames, file_count):
-  # Set the noise threshold
-  k = 9
+def group_duplicate_files(path, filenames, file_count):
+  '''
+  To group the files whose pre-processed code is identical
+  '''
+  group_ids = {}
+  representatives = []
+  preprocessed_files = {}
+  file_groups = np.empty(file_count, dtype=np.int64)
+
+  for i in range(file_count):
+    clean_code = preprocess_code(path, filenames[i])
+    digest = hl.sha1(clean_code.encode('utf-8')).hexdigest()
+
+    # The first file of each group represents it in the comparison
+    if digest not in group_ids:
+      group_ids[digest] = len(representatives)
+      representatives.append(filenames[i])
+      preprocessed_files[filenames[i]] = clean_code
+
+    file_groups[i] = group_ids[digest]
+
+  return preprocessed_files, representatives, file_groups
 
-  # Preprocess each file in directory
+
+def list_duplicate_groups(filenames, file_groups, duplicate_results):
+  '''
+  To list the members of every group having 2 or more identical, non-blank files
+  '''
+  duplicate_groups = {}
+  for i in range(len(filenames)):
+    if duplicate_results[file_groups[i]] > 0:
+      duplicate_groups.setdefault(file_groups[i], []).append(filenames[i])
+
+  return [members for members in duplicate_groups.values() if len(members) > 1]
+
+
+def derive_window_size(max_length):
+  '''
+  To derive the window size from the length of the longest pre-processed code
+  '''
+  return max(1, math.floor(math.log(max(max_length, 1))))
+
+
+def preprocess_directory(path, filenames, file_count, preprocessed_files=None, k=NOISE_THRESHOLD):
+  # Preprocess each file in directory unless done already
   k_grams = {}
   max_length = 0
   hash_values = {}
-  preprocessed_files = {}
+  preprocessed_files = preprocessed_files or {}
   for i in range(file_count):
-    preprocessed_files[filenames[i]] = preprocess_code(path, filenames[i])
+    if filenames[i] not in preprocessed_files:
+      preprocessed_files[filenames[i]] = preprocess_code(path, filenames[i])
     max_length = max(max_length, len(preprocessed_files[filenames[i]]))
     # print(preprocessed_files)
 
@@ -249,8 +326,7 @@ def preprocess_directory(path, filenames, file_count):
     # print('hash_values', hash_values)
 
   # Set the window size
-  window_size = max(1, math.floor(math.log(max_length)))
-  print(f'Configuring window size to {window_size}')
+  window_size = derive_window_size(max_length)
 
   return hash_values, window_size
 
@@ -270,7 +346,8 @@ def extract_directory_fingerprints(filenames, file_count, hash_values, window_si
 
 
 def generate_file_report(specific_file, filenames, file_count, fingerprints):
-  data = []
+  specific_id = filenames.index(specific_file)
+  source, results = [], []
 
   # Compare with every potential source file
   for i in tqdm(range(file_count)):
@@ -283,24 +360,25 @@ def generate_file_report(specific_file, filenames, file_count, fingerprints):
     result = check_for_plagiarism(specific_file, filenames[i], fingerprints[specific_file], fingerprints[filenames[i]])
 
     # Store the plagiarism percentage
-    data.append([specific_file, filenames[i], result])
+    source.append(i)
+    results.append(result)
 
-  # Create a dataframe of acquired results
-  # plagiarism_logs = pd.DataFrame(data, columns=['Submitted_Code', 'Source_Code', 'Plagiarism(%)', 'Remarks'])
-  plagiarism_logs = pd.DataFrame(data, columns=['Submitted_Code', 'Source_Code', 'Plagiarism(%)'])
+  return PlagiarismResults(filenames, np.full(len(source), specific_id), source, results, symmetric=False)
 
-  # Extract the plagiarism report from the list of logs
-  plagiarism_report = plagiarism_logs.sort_values(by=['Plagiarism(%)'], ascending=False).reset_index(drop=True)
 
-  # Treat results obtained from blank files
-  # plagiarism_report.loc[plagiarism_report['Submitted_Code'] in blank_files, ['Source_Code','Plagiarism(%)']] = 'NA'
-  # plagiarism_report['Source_Code'] = np.where(plagiarism_report['Submitted_Code'] in blank_files, 'NA', plagiarism_report['Plagiarism(%)'])
+def generate_batch_report(filenames, file_count, fingerprints, workers=1, checkpoint_path=None, tile_size=256, collector=None, keep_checkpoints=False):
+  collector = collector or ResultsCollector(filenames)
 
-  return plagiarism_logs, plagiarism_report
+  # Split the comparison into checkpointed tiles for parallel or resumable runs
+  if checkpoint_path:
+    return tiling.generate_tiled_batch_report(filenames, file_count, fingerprints, checkpoint_path, workers, tile_size, collector, keep_checkpoints)
 
+  # Parallel runs without a checkpoint path share their tiles through a scratch directory
+  if workers != 1:
+    with tempfile.TemporaryDirectory(prefix='moss_tiles_') as scratch_path:
+      return tiling.generate_tiled_batch_report(filenames, file_count, fingerprints, scratch_path, workers, tile_size, collector, keep_checkpoints=True)
 
-def generate_batch_report(filenames, file_count, fingerprints):
-  data = []
+  submitted, source, results = [], [], []
 
   # For each submitted file
   for i in tqdm(range(file_count)):
@@ -312,77 +390,391 @@ def generate_batch_report(filenames, file_count, fingerprints):
       result = check_for_plagiarism(filenames[i], filenames[j], fingerprints[filenames[i]], fingerprints[filenames[j]])
 
       # Store the plagiarism percentage
-      data.append([filenames[i], filenames[j], result])
-      data.append([filenames[j], filenames[i], result])
+      submitted.append(i)
+      source.append(j)
+      results.append(result)
 
-  plagiarism_logs = pd.DataFrame(data, columns=['Submitted_Code', 'Source_Code', 'Plagiarism(%)'])
+    # Hand the finished rows over to the collector
+    if len(results) >= COLLECT_CHUNK_PAIRS or i == file_count - 1:
+      collector.add(submitted, source, results)
+      submitted, source, results = [], [], []
 
-  # Extract the plagiarism report from the list of logs
-  plagiarism_report = plagiarism_logs.loc[plagiarism_logs.groupby(['Submitted_Code'], sort=True)['Plagiarism(%)'].idxmax()].sort_values(by=['Plagiarism(%)'], ascending=False).reset_index(drop=True)
-  
-  return plagiarism_logs, plagiarism_report
+  return collector
+
+
+def generate_indexed_batch_report(filenames, file_count, fingerprints, collector=None):
+  '''
+  To compare only the pairs of files sharing at least one fingerprint, using an inverted index
+  '''
+  fingerprint_sets = [set(fingerprints[filenames[i]]) for i in range(file_count)]
+  sizes = [len(fingerprint_set) for fingerprint_set in fingerprint_sets]
+  collector = collector or ResultsCollector(filenames, blank=np.array(sizes) == 0)
+
+  # Map each fingerprint to the files containing it
+  inverted_index = {}
+  for i in range(file_count):
+    for fingerprint in fingerprint_sets[i]:
+      inverted_index.setdefault(fingerprint, []).append(i)
+
+  submitted, source, results = [], [], []
+
+  # For each submitted file
+  for i in tqdm(range(file_count)):
+    # Hand the finished rows over to the collector
+    if len(results) >= COLLECT_CHUNK_PAIRS:
+      collector.add(submitted, source, results)
+      submitted, source, results = [], [], []
+
+    if not sizes[i]:
+      continue
+
+    # Count the fingerprints shared with every later file
+    candidates = np.fromiter((j for fingerprint in fingerprint_sets[i] for j in inverted_index[fingerprint] if j > i), dtype=np.int64)
+    candidate_ids, common_counts = np.unique(candidates, return_counts=True)
+
+    for j, common_count in zip(candidate_ids.tolist(), common_counts.tolist()):
+      result = round(100 * common_count / (sizes[i] + sizes[j] - common_count), 2)
+      if result > 0:
+        submitted.append(i)
+        source.append(j)
+        results.append(result)
+
+  collector.add(submitted, source, results)
+  return collector
+
+
+def fingerprint_value(fingerprint):
+  '''
+  To read a fingerprint (a hexadecimal SHA-1 digest or a rolling hash) as an integer
+  '''
+  return fingerprint if isinstance(fingerprint, int) else int(fingerprint[:8], 16)
+
+
+def compute_minhash_signatures(filenames, file_count, fingerprints, signature_length):
+  '''
+  To summarise the fingerprints of each file as a MinHash signature
+  '''
+  rng = np.random.default_rng(LSH_SEED)
+  multipliers = rng.integers(1, MERSENNE_PRIME, size=signature_length, dtype=np.uint64)
+  increments = rng.integers(0, MERSENNE_PRIME, size=signature_length, dtype=np.uint64)
+
+  signatures = np.full((file_count, signature_length), np.iinfo(np.uint64).max, dtype=np.uint64)
+  for i in range(file_count):
+    if fingerprints[filenames[i]]:
+      # Reduce each fingerprint below the prime so that the products fit in 64 bits
+      values = np.array([fingerprint_value(fingerprint) % MERSENNE_PRIME for fingerprint in set(fingerprints[filenames[i]])], dtype=np.uint64)
+      signatures[i] = ((np.outer(values, multipliers) + increments) % np.uint64(MERSENNE_PRIME)).min(axis=0)
+
+  return signatures
+
+
+def generate_lsh_batch_report(filenames, file_count, fingerprints, collector=None, bands=LSH_BANDS, rows=LSH_ROWS):
+  '''
+  To compare only the pairs whose MinHash signatures collide in at least one band
+
+  Pairs that never collide are left at 0, so weak matches may be missed.
+  '''
+  signatures = compute_minhash_signatures(filenames, file_count, fingerprints, bands * rows)
+  blank = np.array([not fingerprints[filenames[i]] for i in range(file_count)])
+  collector = collector or ResultsCollector(filenames, blank=blank)
+
+  # Bucket the files by each band of their signature
+  candidates = set()
+  for band in range(bands):
+    buckets = {}
+    for i in np.flatnonzero(~blank).tolist():
+      buckets.setdefault(signatures[i, band*rows:(band+1)*rows].tobytes(), []).append(i)
+
+    for bucket in buckets.values():
+      for x in range(len(bucket)):
+        for y in range(x + 1, len(bucket)):
+          candidates.add((bucket[x], bucket[y]))
+
+  submitted, source, results = [], [], []
+
+  # Evaluate the candidate pairs for plagiarism
+  for i, j in tqdm(sorted(candidates)):
+    result = check_for_plagiarism(filenames[i], filenames[j], fingerprints[filenames[i]], fingerprints[filenames[j]])
+    if result > 0:
+      submitted.append(i)
+      source.append(j)
+      results.append(result)
+
+    # Hand the results over to the collector in chunks
+    if len(results) >= COLLECT_CHUNK_PAIRS:
+      collector.add(submitted, source, results)
+      submitted, source, results = [], [], []
+
+  collector.add(submitted, source, results)
+  return collector
+
+
+def compare_batch(plan, filenames, file_count, fingerprints, collector, checkpoint_path=None, tile_size=256, keep_checkpoints=False):
+  '''
+  To compare the batch using the strategy chosen by the execution plan
+  '''
+  if plan['strategy'] == 'index':
+    return generate_indexed_batch_report(filenames, file_count, fingerprints, collector)
+  elif plan['strategy'] == 'lsh':
+    return generate_lsh_batch_report(filenames, file_count, fingerprints, collector)
+
+  return generate_batch_report(filenames, file_count, fingerprints, plan['workers'], checkpoint_path, tile_size, collector, keep_checkpoints)
 
 
-def batch_originality_scores(plagiarism_logs, plagiarism_report):
+def prepare_collector(plan, filenames, file_groups, fingerprints, representatives, duplicate_results, log_writer=None, keep_logs=True):
   '''
-  To score individual submissions based on the originality of their approach
+  To set up the collector of a batch comparison over the group representatives
   '''
-  # Calculate the mean plagiarism %age for each file
-  grouped_logs = plagiarism_logs.groupby('Submitted_Code')['Plagiarism(%)'].mean()
+  blank = None
+  if plan['strategy'] != 'exhaustive':
+    blank = np.array([not fingerprints[representative] for representative in representatives])
 
-  # Calculate the originality score for each file
-  originality_df = pd.DataFrame(zip(grouped_logs.index, round((100 - grouped_logs) / 10,2)), columns=['Submitted_Code', 'Originality_Score'])
+  return ResultsCollector(filenames, file_groups, duplicate_results, blank, log_writer, plan['top_k'], keep_logs)
 
-  # Update the report
-  plagiarism_report = pd.merge(plagiarism_report, originality_df, left_on='Submitted_Code', right_on='Submitted_Code')
 
-  return plagiarism_report[['Submitted_Code',	'Originality_Score', 'Source_Code',	'Plagiarism(%)']]
+def streams_logs(plan):
+  '''
+  To tell whether the collector can stream the logs of the plan as the comparison produces them
+
+  Only the full logs of an exhaustive comparison can, the others are written once complete.
+  '''
+  return plan['strategy'] == 'exhaustive' and plan['top_k'] is None
 
 
-def fetch_insights(plagiarism_report):
-  insights = {}
-  insights['max'] = plagiarism_report['Plagiarism(%)'].max()
-  insights['min'] = plagiarism_report['Plagiarism(%)'].min()
-  insights['mean'] = round(plagiarism_report['Plagiarism(%)'].mean(), 2)
-  insights['std'] = round(plagiarism_report['Plagiarism(%)'].std(), 2)
-  return insights
+def write_logs(log_writer, plagiarism_logs):
+  '''
+  To export complete logs in chunks
+  '''
+  for start in range(0, len(plagiarism_logs), 2 * LOG_CHUNK_PAIRS):
+    log_writer.write(plagiarism_logs.iloc[start:start + 2 * LOG_CHUNK_PAIRS])
 
 
-def trigger_moss(path, specific_file=None, want_exhaustive_logs=False):
+def trigger_moss(path, specific_file=None, want_exhaustive_logs=False, workers=None, checkpoint_path=None, tile_size=256, log_writer=None, memory_budget_mb=None, strategy=None, top_k=None, k=NOISE_THRESHOLD, window_size=None, keep_checkpoints=False, rolling_hash=False, keep_logs=True):
   '''
   To run MOSS for all the files present in the given path 
+
+  With rolling_hash, the k-grams are hashed as sweep_moss hashes them instead of with SHA-1,
+  so that the report matches the sweep setting with the same k and window size.
+
+  Without keep_logs, no logs are returned and only the report is kept in memory, while a
+  log_writer still receives the full logs (streamed as they are produced where possible).
+  The insights of a batch hold the execution plan, whose top_k tells top-k logs from full ones.
   '''
   # Extract all files present in the given path
   filenames = os.listdir(path)
   file_count = len(filenames)
   print(f'Received a batch of {file_count} files')
 
-  # Preprocess each file in directory
-  hash_values, window_size = preprocess_directory(path, filenames, file_count)
-  # print(hash_values, window_size)
+  # Plan the comparison from the size of the batch and the resources at hand
+  plan = None
+  if not specific_file:
+    total_bytes = sum(os.path.getsize(os.path.join(path, filename)) for filename in filenames)
+    plan = planner.plan_execution(file_count, total_bytes, os.cpu_count(), memory_budget_mb, want_exhaustive_logs, workers, strategy, top_k, keep_logs)
+    planner.display_plan(plan)
+
+  # Group identical files so that only one file per group is fingerprinted and compared
+  preprocessed_files, representatives, file_groups = group_duplicate_files(path, filenames, file_count)
+  representative_count = len(representatives)
+  if representative_count < file_count:
+    print(f'Found {file_count - representative_count} duplicate files, comparing {representative_count} unique files')
+
+  if rolling_hash:
+    fingerprints, window_size = extract_rolling_fingerprints(representatives, representative_count, preprocessed_files, k, window_size)
+    print(f'Configuring window size to {window_size}')
+  else:
+    # Preprocess each file in directory
+    hash_values, derived_window_size = preprocess_directory(path, representatives, representative_count, preprocessed_files, k)
+    window_size = window_size or derived_window_size
+    print(f'Configuring window size to {window_size}')
+    # print(hash_values, window_size)
 
-  # Implement the Winnowing algorithm
-  fingerprints = extract_directory_fingerprints(filenames, file_count, hash_values, window_size)
-  # print(fingerprints)
+    # Implement the Winnowing algorithm
+    fingerprints = extract_directory_fingerprints(representatives, representative_count, hash_values, window_size)
+    # print(fingerprints)
+
+  # Identical files match fully unless they are blank
+  duplicate_results = np.array([100.0 if fingerprints[representative] else -1 for representative in representatives])
 
   # Perform comparison
   if specific_file:
     print('Generating plagiarism report for the chosen file')
-    plagiarism_logs, plagiarism_report = generate_file_report(specific_file, filenames, file_count, fingerprints)
+    specific_id = filenames.index(specific_file)
+    results = generate_file_report(representatives[file_groups[specific_id]], representatives, representative_count, fingerprints)
+    results = results.fan_out(filenames, file_groups, duplicate_results, specific_id)
   else:
     print('Generating plagiarism report')
-    plagiarism_logs, plagiarism_report = generate_batch_report(filenames, file_count, fingerprints)
-    plagiarism_report = batch_originality_scores(plagiarism_logs, plagiarism_report)
-  
-  # Fetch the insights
-  insights = fetch_insights(plagiarism_report)
-  
+    # Logs that cannot be streamed to the log writer are kept until they are complete
+    collector = prepare_collector(plan, filenames, file_groups, fingerprints, representatives, duplicate_results, log_writer, keep_logs or (log_writer is not None and not streams_logs(plan)))
+    results = compare_batch(plan, representatives, representative_count, fingerprints, collector, checkpoint_path, tile_size, keep_checkpoints)
+
+  # Score the files and fetch the insights in a single pass over the results
   if specific_file:
-    insights['originality_score'] = round((100 - plagiarism_logs[plagiarism_logs['Submitted_Code'] == specific_file]['Plagiarism(%)'].mean()) / 10, 2)
+    plagiarism_logs, plagiarism_report, insights = results.summarize(specific_id)
+  else:
+    plagiarism_logs, plagiarism_report, insights = results.summarize()
+    insights['plan'] = plan
+  insights['duplicate_groups'] = list_duplicate_groups(filenames, file_groups, duplicate_results)
+
+  # Logs that could not be streamed are exported once they are complete
+  if log_writer is not None and (specific_file or results.log_writer is None):
+    write_logs(log_writer, plagiarism_logs)
+
+  if not keep_logs and not specific_file:
+    plagiarism_logs = None
 
   return plagiarism_logs, plagiarism_report, insights
 
 
+def compute_powers(base, length):
+  '''
+  To list the powers of the base modulo the prime
+  '''
+  powers = np.ones(length, dtype=np.int64)
+  for i in range(1, length):
+    powers[i] = powers[i-1] * base % MERSENNE_PRIME
+  return powers
+
+
+def prepare_rolling_hash(clean_code, powers):
+  '''
+  To compute the prefix sums from which the hash of any k-gram can be read off
+  '''
+  codes = np.frombuffer(clean_code.encode('utf-32-le'), dtype=np.uint32).astype(np.int64)
+  prefix = np.zeros(len(codes) + 1, dtype=np.int64)
+  prefix[1:] = np.cumsum(codes * powers[:len(codes)] % MERSENNE_PRIME)
+  return prefix
+
+
+def rolling_hash_values(prefix, k, inverse_powers):
+  '''
+  To hash every k-gram of the code from its rolling hash prefix sums
+  '''
+  length = len(prefix) - 1
+  if length < k:
+    return np.array([], dtype=np.int64)
+
+  return (prefix[k:] - prefix[:-k]) % MERSENNE_PRIME * inverse_powers[:length - k + 1] % MERSENNE_PRIME
+
+
+def prepare_rolling_hash_state(clean_codes, max_length):
+  '''
+  To build the prefix sums of every code and the inverse powers shared by every k
+  '''
+  powers = compute_powers(ROLLING_HASH_BASE, max_length + 1)
+  inverse_powers = compute_powers(pow(ROLLING_HASH_BASE, MERSENNE_PRIME - 2, MERSENNE_PRIME), max_length + 1)
+  prefixes = [prepare_rolling_hash(clean_code, powers) for clean_code in clean_codes]
+  return prefixes, inverse_powers
+
+
+def winnow_hash_values(hash_values, window_size):
+  '''
+  To select a fingerprint from each window, as implement_winnowing does, over an array of hash values
+  '''
+  if len(hash_values) < window_size:
+    return []
+
+  # The first minimum of every window, found at once
+  window_minima = np.lib.stride_tricks.sliding_window_view(hash_values, window_size).argmin(axis=1)
+
+  w = 0
+  fingerprints = []
+  while w < len(window_minima):
+    fingerprints.append(int(hash_values[w + window_minima[w]]))
+    w = w + window_minima[w] + 1
+
+  return fingerprints
+
+
+def extract_rolling_fingerprints(filenames, file_count, preprocessed_files, k=NOISE_THRESHOLD, window_size=None):
+  '''
+  To fingerprint the pre-processed files from the rolling hash of their k-grams, as sweep_moss does, along with the window size used
+  '''
+  max_length = max([len(preprocessed_files[filenames[i]]) for i in range(file_count)] + [0])
+  window_size = window_size or derive_window_size(max_length)
+
+  prefixes, inverse_powers = prepare_rolling_hash_state([preprocessed_files[filenames[i]] for i in range(file_count)], max_length)
+  return {filenames[i]: winnow_hash_values(rolling_hash_values(prefixes[i], k, inverse_powers), window_size) for i in range(file_count)}, window_size
+
+
+def fetch_score_distribution(plagiarism_report):
+  '''
+  To count the files by the plagiarism percentage of their best match
+  '''
+  counts, _ = np.histogram(plagiarism_report['Plagiarism(%)'].to_numpy(dtype=float), bins=SCORE_BINS)
+  return dict(zip(SCORE_BIN_LABELS, counts.tolist()))
+
+
+def sweep_moss(path, noise_thresholds=SWEEP_NOISE_THRESHOLDS, window_sizes=SWEEP_WINDOW_SIZES, workers=None, memory_budget_mb=None, strategy=None, top_k=None, log_writer_factory=None):
+  '''
+  To run MOSS for several (k, window size) settings while pre-processing each file only once
+
+  The k-grams are hashed with a rolling hash shared by all settings, so the reports compare
+  with each other, and with trigger_moss run with rolling_hash, but not exactly with the
+  default SHA-1 reports of trigger_moss.
+
+  Only the report, insights and distribution of each setting are kept. Its logs are written
+  to log_writer_factory(k, window_size), if given, which the sweep closes once they are done.
+  '''
+  # Extract all files present in the given path
+  filenames = os.listdir(path)
+  file_count = len(filenames)
+  print(f'Received a batch of {file_count} files')
+
+  # Preprocess each file in directory once, setting duplicates aside
+  preprocessed_files, representatives, file_groups = group_duplicate_files(path, filenames, file_count)
+  representative_count = len(representatives)
+  max_length = max([len(preprocessed_files[representative]) for representative in representatives] + [0])
+
+  # Resolve the derived window size and skip repeated settings
+  settings = []
+  for k in noise_thresholds:
+    for window_size in window_sizes:
+      setting = (k, window_size or derive_window_size(max_length))
+      if setting not in settings:
+        settings.append(setting)
+
+  # A single plan serves every setting, as they share the batch
+  total_bytes = sum(os.path.getsize(os.path.join(path, filename)) for filename in filenames)
+  plan = planner.plan_execution(file_count, total_bytes, os.cpu_count(), memory_budget_mb, False, workers, strategy, top_k, log_writer_factory is not None, len(settings))
+  planner.display_plan(plan)
+
+  # Build the rolling hash state shared by every k
+  prefixes, inverse_powers = prepare_rolling_hash_state([preprocessed_files[representative] for representative in representatives], max_length)
+
+  sweep_results = {}
+  summary = []
+  hash_values = {}
+  for k, window_size in settings:
+    print(f'Generating plagiarism report for k = {k} and window size = {window_size}')
+
+    # Hash the k-grams once per k and winnow them for each window size
+    if k not in hash_values:
+      hash_values[k] = [rolling_hash_values(prefix, k, inverse_powers) for prefix in prefixes]
+    fingerprints = {representatives[i]: winnow_hash_values(hash_values[k][i], window_size) for i in range(representative_count)}
+    duplicate_results = np.array([100.0 if fingerprints[representative] else -1 for representative in representatives])
+
+    # Logs are only kept in memory when they cannot be streamed to the log writer
+    log_writer = log_writer_factory(k, window_size) if log_writer_factory is not None else None
+    collector = prepare_collector(plan, filenames, file_groups, fingerprints, representatives, duplicate_results, log_writer, log_writer is not None and not streams_logs(plan))
+    results = compare_batch(plan, representatives, representative_count, fingerprints, collector)
+
+    plagiarism_logs, plagiarism_report, insights = results.summarize()
+    insights['duplicate_groups'] = list_duplicate_groups(filenames, file_groups, duplicate_results)
+    distribution = fetch_score_distribution(plagiarism_report)
+
+    if log_writer is not None:
+      if results.log_writer is None:
+        write_logs(log_writer, plagiarism_logs)
+      log_writer.close()
+
+    sweep_results[(k, window_size)] = {'report': plagiarism_report, 'insights': insights, 'distribution': distribution}
+    summary.append({'k': k, 'Window_Size': window_size, 'Maximum_Plagiarism(%)': insights['max'], 'Mean_Plagiarism(%)': insights['mean'], 'Standard_Deviation': insights['std'], **distribution})
+
+  sweep_report = pd.DataFrame(summary, columns=['k', 'Window_Size', 'Maximum_Plagiarism(%)', 'Mean_Plagiarism(%)', 'Standard_Deviation'] + SCORE_BIN_LABELS)
+
+  return sweep_report, sweep_results
+
+
 def fetch_group_insights(group_logs):
   '''
   To formulate insights after identifying groups
@@ -398,16 +790,24 @@ def fetch_group_insights(group_logs):
   return group_insights
 
 
-def diagnose_clusters(plagiarism_report):
+def diagnose_clusters(plagiarism_report, duplicate_groups=None):
   '''
   To identify the groups of plagiarised submissions
   '''
   group_logs = plagiarism_report.copy()
-  group_logs['Group'] = group_logs['Submitted_Code']
+  group_logs['Group'] = group_logs['Submitted_Code'].astype(object)
+
+  # Identical submissions form a cluster of their own
+  duplicate_files = set()
+  for members in duplicate_groups or []:
+    group_logs.loc[group_logs['Submitted_Code'].isin(members), 'Group'] = members[0]
+    duplicate_files.update(members)
 
   for index, row in group_logs.iterrows():
     try:
-      if row['Plagiarism(%)'] >= 80.0:
+      if row['Submitted_Code'] in duplicate_files:
+        continue
+      elif row['Plagiarism(%)'] >= 80.0:
         source_index = group_logs[group_logs['Submitted_Code'] == row['Source_Code']].index.values[0]
         group_logs.at[index, 'Group'] = group_logs.loc[source_index]['Group']
       else:
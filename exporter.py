@@ -0,0 +1,175 @@
+# Streams reports to disk in chunks as columnar (Parquet/Arrow) or compressed CSV files
+import os
+import io
+import gzip
+import queue
+import threading
+from datetime import datetime
+
+# Optional dependencies for the columnar and zstd formats
+try:
+  import pyarrow as pa
+  import pyarrow.parquet as pq
+except ImportError:
+  pa = pq = None
+
+try:
+  import zstandard as zstd
+except ImportError:
+  zstd = None
+
+EXTENSIONS = {
+  'csv': '.csv',
+  'csv.gz': '.csv.gz',
+  'csv.zst': '.csv.zst',
+  'parquet': '.parquet',
+  'arrow': '.arrows'
+}
+
+# Columns holding filenames, which repeat across rows and compress well as dictionaries
+FILENAME_COLUMNS = ['Submitted_Code', 'Source_Code']
+
+CHUNK_SIZE = 1_000_000
+
+
+def available_formats():
+  '''
+  To list the formats whose dependencies are installed in this environment
+  '''
+  return [fmt for fmt in EXTENSIONS if (fmt not in ['parquet', 'arrow'] or pa is not None) and (fmt != 'csv.zst' or zstd is not None)]
+
+
+def export_path(results_path, filename, fmt):
+  '''
+  To build a timestamped, portable path for the exported file
+  '''
+  os.makedirs(results_path, exist_ok=True)
+  return os.path.join(results_path, f"{filename}_{datetime.now().strftime('%Y%m%d_%H%M%S')}{EXTENSIONS[fmt]}")
+
+
+class ReportWriter:
+  '''
+  To write a report to a single file one chunk at a time
+  '''
+  def __init__(self, path, fmt='csv'):
+    if fmt not in EXTENSIONS:
+      raise ValueError(f"Unsupported export format {fmt}, choose from {', '.join(EXTENSIONS)}")
+    if fmt in ['parquet', 'arrow'] and pa is None:
+      raise ImportError(f'pyarrow is required to export {fmt} files')
+    if fmt == 'csv.zst' and zstd is None:
+      raise ImportError('zstandard is required to export csv.zst files')
+
+    self.path = path
+    self.fmt = fmt
+    self.rows = 0
+    self._file = None
+    self._writer = None
+    self._schema = None
+
+  def _open_text(self):
+    if self.fmt == 'csv':
+      return open(self.path, 'w', encoding='utf8', newline='')
+    if self.fmt == 'csv.gz':
+      return gzip.open(self.path, 'wt', encoding='utf8', newline='')
+    compressor = zstd.ZstdCompressor().stream_writer(open(self.path, 'wb'))
+    return io.TextIOWrapper(compressor, encoding='utf8', newline='')
+
+  def _to_table(self, chunk):
+    if self._schema is None:
+      table = pa.Table.from_pandas(chunk, preserve_index=False)
+
+      # Dictionary-encode the filename columns
+      for column in FILENAME_COLUMNS:
+        if column in table.column_names:
+          index = table.schema.get_field_index(column)
+          table = table.set_column(index, column, table.column(column).cast(pa.string()).dictionary_encode())
+
+      self._schema = table.schema
+      return table
+
+    return pa.Table.from_pandas(chunk, schema=self._schema, preserve_index=False)
+
+  def write(self, chunk):
+    if self.fmt in ['csv', 'csv.gz', 'csv.zst']:
+      if self._file is None:
+        self._file = self._open_text()
+        chunk.to_csv(self._file, index=False)
+      else:
+        chunk.to_csv(self._file, index=False, header=False)
+
+    else:
+      table = self._to_table(chunk)
+      if self._writer is None:
+        if self.fmt == 'parquet':
+          self._writer = pq.ParquetWriter(self.path, self._schema, compression='zstd')
+        else:
+          self._file = pa.OSFile(self.path, 'wb')
+          self._writer = pa.ipc.new_stream(self._file, self._schema)
+      self._writer.write_table(table)
+
+    self.rows += len(chunk)
+
+  def close(self):
+    if self._writer is not None:
+      self._writer.close()
+    if self._file is not None:
+      self._file.close()
+    self._writer = self._file = None
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    self.close()
+
+
+class BackgroundWriter:
+  '''
+  To write chunks on a separate thread so that exporting overlaps with the comparison
+  '''
+  def __init__(self, writer, max_pending=8):
+    self.writer = writer
+    self.error = None
+    self._queue = queue.Queue(maxsize=max_pending)
+    self._thread = threading.Thread(target=self._drain, daemon=True)
+    self._thread.start()
+
+  def _drain(self):
+    while True:
+      chunk = self._queue.get()
+      if chunk is None:
+        break
+      if self.error is None:
+        try:
+          self.writer.write(chunk)
+        except Exception as e:
+          self.error = e
+
+  def write(self, chunk):
+    if self.error is not None:
+      raise self.error
+    self._queue.put(chunk)
+
+  def close(self):
+    self._queue.put(None)
+    self._thread.join()
+    self.writer.close()
+    if self.error is not None:
+      raise self.error
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    self.close()
+
+
+def export_frame(report, path, fmt='csv', chunk_size=CHUNK_SIZE):
+  '''
+  To export a whole DataFrame in chunks
+  '''
+  with ReportWriter(path, fmt) as writer:
+    for start in range(0, max(len(report), 1), chunk_size):
+      writer.write(report.iloc[start:start+chunk_size])
+
+  return path
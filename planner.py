@@ -0,0 +1,169 @@
+# Picks how trigger_moss runs a batch from its size, the available cores and a memory budget
+import os
+
+STRATEGIES = ['exhaustive', 'index', 'lsh']
+
+# Rough costs measured on typical Python submissions
+FINGERPRINTS_PER_BYTE = 0.06
+BYTES_PER_FINGERPRINT = 100
+SECONDS_PER_BYTE_PREPROCESSED = 1.5e-6
+SECONDS_PER_COMPARISON = 2e-6
+SECONDS_PER_FINGERPRINT_COMPARED = 1e-7
+SECONDS_PER_FINGERPRINT_INDEXED = 1e-6
+SECONDS_PER_FINGERPRINT_SIGNED = 1e-6
+
+# Share of all pairs expected to be compared by the candidate strategies
+CANDIDATE_FRACTIONS = {'index': 0.2, 'lsh': 0.01}
+
+# Peak memory measured per unordered pair of the full logs, per row of the top-k logs,
+# for the chunk of pairs being collected, and per candidate pair held by the LSH strategy
+BYTES_PER_FULL_PAIR = 120
+BYTES_PER_TOP_K_ROW = 80
+BYTES_PER_COLLECTED_CHUNK = 14 * 2**20
+BYTES_PER_CANDIDATE_PAIR = 160
+
+# Memory measured per row of the report kept for each setting of a sweep
+BYTES_PER_REPORT_ROW = 25
+
+# Limits beyond which the exact strategies give way to the approximate one
+EXACT_MAX_SECONDS = 600
+INDEX_MAX_FILES = 20000
+
+# Below this many pairs per worker, starting processes costs more than it saves
+MIN_PAIRS_PER_WORKER = 250_000
+
+DEFAULT_TOP_K = 10
+DEFAULT_MEMORY_BUDGET_MB = 4096
+MEMINFO_PATH = '/proc/meminfo'
+
+
+def available_memory_mb():
+  '''
+  To read the memory currently available on this machine
+  '''
+  # MemAvailable counts the reclaimable page cache, which the free pages leave out
+  try:
+    with open(MEMINFO_PATH, encoding='utf8') as f:
+      for line in f:
+        if line.startswith('MemAvailable:'):
+          return int(line.split()[1]) // 2**10
+  except (OSError, ValueError, IndexError):
+    pass
+
+  try:
+    return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') // 2**20
+  except (ValueError, OSError, AttributeError):
+    return DEFAULT_MEMORY_BUDGET_MB
+
+
+def estimate_cost(strategy, workers, output, file_count, total_bytes, top_k=DEFAULT_TOP_K, setting_count=1):
+  '''
+  To estimate the running time (seconds) and peak memory (MB) of a plan
+
+  A sweep preprocesses the batch once and compares it once per setting, keeping a report each time.
+  '''
+  pair_count = file_count * (file_count - 1) // 2
+  fingerprint_count = total_bytes * FINGERPRINTS_PER_BYTE
+  pair_seconds = SECONDS_PER_COMPARISON + 2 * SECONDS_PER_FINGERPRINT_COMPARED * fingerprint_count / max(file_count, 1)
+
+  seconds = total_bytes * SECONDS_PER_BYTE_PREPROCESSED
+  memory = fingerprint_count * BYTES_PER_FINGERPRINT
+
+  if strategy == 'exhaustive':
+    compared_pairs = pair_count
+    seconds += setting_count * compared_pairs * pair_seconds / workers
+  else:
+    compared_pairs = pair_count * CANDIDATE_FRACTIONS[strategy]
+    seconds += setting_count * compared_pairs * pair_seconds
+    if strategy == 'index':
+      seconds += setting_count * fingerprint_count * SECONDS_PER_FINGERPRINT_INDEXED
+      memory += fingerprint_count * BYTES_PER_FINGERPRINT
+    else:
+      seconds += setting_count * fingerprint_count * SECONDS_PER_FINGERPRINT_SIGNED
+      memory += compared_pairs * BYTES_PER_CANDIDATE_PAIR
+
+  # The results are collected a chunk at a time, so only the kept logs grow with the batch
+  memory += BYTES_PER_COLLECTED_CHUNK + setting_count * file_count * BYTES_PER_REPORT_ROW
+  if output == 'full':
+    memory += pair_count * BYTES_PER_FULL_PAIR
+  elif output == 'top_k':
+    memory += file_count * top_k * BYTES_PER_TOP_K_ROW
+
+  return {'pairs': pair_count, 'compared_pairs': int(compared_pairs), 'seconds': round(seconds, 1), 'memory_mb': round(memory / 2**20, 1)}
+
+
+def plan_execution(file_count, total_bytes, cpu_count=None, memory_budget_mb=None, want_exhaustive_logs=False, workers=None, strategy=None, top_k=None, want_logs=True, setting_count=1):
+  '''
+  To pick the comparison strategy, worker count and output mode for a batch
+
+  Any of workers, strategy or top_k given by the user is kept as is. Without want_logs only
+  the report is kept, and setting_count plans a sweep comparing the batch once per setting.
+  '''
+  cpu_count = cpu_count or os.cpu_count() or 1
+  memory_budget_mb = memory_budget_mb or available_memory_mb()
+  pair_count = file_count * (file_count - 1) // 2
+
+  if strategy is not None and strategy not in STRATEGIES:
+    raise ValueError(f"Unsupported comparison strategy {strategy}, choose from {', '.join(STRATEGIES)}")
+
+  # Spread the exhaustive comparison over as many cores as the batch can keep busy
+  if workers is None:
+    workers = max(1, min(cpu_count, pair_count // MIN_PAIRS_PER_WORKER))
+
+  # Keep the exhaustive logs whenever they fit in memory
+  output = 'full'
+  if top_k is not None:
+    output = 'top_k'
+  elif not want_logs:
+    output = 'summary'
+  elif not want_exhaustive_logs and estimate_cost('exhaustive', 1, 'full', file_count, total_bytes)['memory_mb'] > memory_budget_mb:
+    output = 'top_k'
+  top_k = top_k or DEFAULT_TOP_K
+
+  # Prefer the exact strategies while they finish in time and fit in memory
+  if strategy is None:
+    exhaustive_cost = estimate_cost('exhaustive', workers, output, file_count, total_bytes, top_k, setting_count)
+    index_cost = estimate_cost('index', 1, output, file_count, total_bytes, top_k, setting_count)
+    lsh_cost = estimate_cost('lsh', 1, output, file_count, total_bytes, top_k, setting_count)
+
+    # Memory only rules out an exact strategy when the approximate one would fit the budget instead
+    fits = lambda cost: cost['memory_mb'] <= memory_budget_mb or lsh_cost['memory_mb'] > memory_budget_mb
+
+    if exhaustive_cost['seconds'] <= EXACT_MAX_SECONDS and fits(exhaustive_cost):
+      strategy = 'exhaustive'
+    elif file_count <= INDEX_MAX_FILES and index_cost['seconds'] <= EXACT_MAX_SECONDS and fits(index_cost):
+      strategy = 'index'
+    else:
+      strategy = 'lsh'
+
+  # Only the exhaustive comparison runs on several processes
+  if strategy != 'exhaustive':
+    workers = 1
+
+  plan = {
+    'strategy': strategy,
+    'workers': workers,
+    'output': output,
+    'top_k': top_k if output == 'top_k' else None,
+    'memory_budget_mb': memory_budget_mb,
+    'settings': setting_count,
+    'estimate': estimate_cost(strategy, workers, output, file_count, total_bytes, top_k, setting_count)
+  }
+
+  return plan
+
+
+def display_plan(plan):
+  estimate = plan['estimate']
+  output = {'full': 'full logs', 'top_k': f"top {plan['top_k']} matches per file", 'summary': 'report only'}[plan['output']]
+  settings = f", {plan['settings']} settings" if plan['settings'] > 1 else ''
+  print(f"Execution plan: {plan['strategy']} comparison on {plan['workers']} worker(s), {output}{settings}")
+  print(f"Estimated cost: {estimate['compared_pairs']} of {estimate['pairs']} pairs compared, ~{estimate['seconds']}s, ~{estimate['memory_mb']} MB of {plan['memory_budget_mb']} MB")
+
+  if plan['strategy'] == 'lsh':
+    print('Warning: approximate comparison, pairs that never collide score 0, so weaker matches and originality scores may differ from an exact run')
+
+  if estimate['memory_mb'] > plan['memory_budget_mb']:
+    print('Warning: the estimated memory exceeds the budget, consider a larger budget or a smaller batch')
+
+  return
@@ -0,0 +1,358 @@
+# Keeps plagiarism results as integer file IDs with a separate ID -> filename table
+import numpy as np
+import pandas as pd
+
+
+def triangle_index(submitted, source, file_count):
+  '''
+  To locate the pair (submitted < source) within the flattened upper triangle
+  '''
+  return submitted * (2 * file_count - submitted - 1) // 2 + (source - submitted - 1)
+
+
+def upper_triangle(file_count):
+  '''
+  To list every pair (submitted < source) in the order the double loop would produce them
+  '''
+  ids = np.arange(file_count)
+  row_lengths = file_count - 1 - ids
+  submitted = np.repeat(ids, row_lengths)
+  source = np.arange(len(submitted)) - np.repeat(triangle_index(ids, ids + 1, file_count) - ids - 1, row_lengths)
+  return submitted, source
+
+
+def fetch_insights(report_results):
+  '''
+  To formulate insights over the plagiarism percentages of the report
+  '''
+  insights = {}
+
+  if len(report_results):
+    insights['max'] = report_results.max()
+    insights['min'] = report_results.min()
+    insights['mean'] = round(report_results.mean(), 2)
+    insights['std'] = round(report_results.std(ddof=1), 2) if len(report_results) > 1 else np.nan
+  else:
+    insights['max'] = insights['min'] = insights['mean'] = insights['std'] = np.nan
+
+  return insights
+
+
+class PlagiarismResults:
+  '''
+  To hold the results of a comparison as arrays of file IDs and plagiarism percentages
+
+  A symmetric result stores each unordered pair (submitted < source) once and stands
+  for both directions of the pair, while an asymmetric one stores ordered pairs as given.
+
+  Passing blank (one flag per file) makes a symmetric result sparse: only the pairs with
+  a positive result are stored, and every other pair scores 0, or -1 when either file
+  is blank.
+  '''
+  def __init__(self, filenames, submitted, source, results, symmetric=True, blank=None):
+    self.filenames = pd.Index(filenames)
+    self.submitted = np.asarray(submitted, dtype=np.int64)
+    self.source = np.asarray(source, dtype=np.int64)
+    self.results = np.asarray(results, dtype=np.float64)
+    self.symmetric = symmetric
+    self.blank = None if blank is None else np.asarray(blank, dtype=bool)
+
+  def __len__(self):
+    if self.blank is not None:
+      return len(self.filenames) * (len(self.filenames) - 1)
+    return len(self.results) * (2 if self.symmetric else 1)
+
+  def filename_column(self, ids):
+    return pd.Categorical.from_codes(ids, categories=self.filenames)
+
+  def densify(self):
+    '''
+    To store every pair of a sparse result explicitly
+    '''
+    submitted, source = upper_triangle(len(self.filenames))
+    results = np.where(self.blank[submitted] | self.blank[source], -1.0, 0.0)
+    results[triangle_index(self.submitted, self.source, len(self.filenames))] = self.results
+    return PlagiarismResults(self.filenames, submitted, source, results)
+
+  def to_logs(self):
+    '''
+    To expose the logs through pandas with categorical filename columns
+    '''
+    if self.blank is not None:
+      return self.densify().to_logs()
+    elif self.symmetric:
+      # Store each result for both directions of the pair
+      submitted = np.column_stack((self.submitted, self.source)).ravel()
+      source = np.column_stack((self.source, self.submitted)).ravel()
+      results = np.repeat(self.results, 2)
+    else:
+      submitted, source, results = self.submitted, self.source, self.results
+
+    return pd.DataFrame({
+      'Submitted_Code': self.filename_column(submitted),
+      'Source_Code': self.filename_column(source),
+      'Plagiarism(%)': results
+    })
+
+  def fan_out(self, filenames, file_groups, duplicate_results, specific_id):
+    '''
+    To expand the results of a file report over the representatives to every member of their groups
+
+    file_groups maps each file to the ID of its representative among self.filenames, and
+    duplicate_results holds the result of comparing two members of the same group.
+    '''
+    group_results = np.full(len(self.filenames), np.nan)
+    group_results[self.source] = self.results
+    specific_group = file_groups[specific_id]
+
+    source = np.delete(np.arange(len(filenames)), specific_id)
+    results = np.where(file_groups[source] == specific_group, duplicate_results[specific_group], group_results[file_groups[source]])
+    return PlagiarismResults(filenames, np.full(len(source), specific_id), source, results, symmetric=False)
+
+  def summarize(self, file_id=None, top_k=None):
+    '''
+    To produce the logs (all pairs, or the top-k matches per file), report and insights
+    '''
+    if self.symmetric:
+      collector = ResultsCollector(self.filenames, blank=self.blank, top_k=top_k)
+      collector.add(self.submitted, self.source, self.results)
+      return collector.summarize()
+
+    plagiarism_logs = self.to_logs()
+    plagiarism_report = plagiarism_logs.sort_values(by=['Plagiarism(%)'], ascending=False).reset_index(drop=True)
+    insights = fetch_insights(plagiarism_report['Plagiarism(%)'].to_numpy())
+
+    if file_id is not None:
+      mask = self.submitted == file_id
+      insights['originality_score'] = round((100 - self.results[mask].mean()) / 10, 2) if mask.any() else np.nan
+
+    return plagiarism_logs, plagiarism_report, insights
+
+
+class ResultsCollector:
+  '''
+  To collect the results of a batch comparison chunk by chunk as the comparison produces them
+
+  The chunks hold unordered pairs of group representatives, which file_groups (one
+  representative ID per file) fans out to every member of the groups as they arrive.
+  duplicate_results holds the result of comparing two members of the same group.
+
+  Every chunk updates the totals and best match of each file, so only the logs asked
+  for are kept: all pairs, the top_k matches of each file, or none without keep_logs.
+
+  Passing blank (one flag per representative) collects a sparse comparison, which only
+  reports its positive results. Otherwise each fanned out chunk of the full logs is also
+  handed to the log_writer, if any, so that the logs are exported while the comparison runs.
+  '''
+  def __init__(self, filenames, file_groups=None, duplicate_results=None, blank=None, log_writer=None, top_k=None, keep_logs=True):
+    self.filenames = pd.Index(filenames)
+    file_count = len(self.filenames)
+    self.file_groups = np.arange(file_count) if file_groups is None else np.asarray(file_groups, dtype=np.int64)
+    self.blank = None if blank is None else np.asarray(blank, dtype=bool)[self.file_groups]
+    self.log_writer = log_writer if blank is None and top_k is None else None
+    self.top_k = top_k if keep_logs else None
+    self.keep_pairs = keep_logs and top_k is None
+    self.submitted, self.source, self.results = [], [], []
+
+    # Running totals and best match of each file
+    self.totals = np.zeros(file_count)
+    self.counts = np.zeros(file_count, dtype=np.int64)
+    self.best_results = np.full(file_count, -np.inf)
+    self.best_sources = np.full(file_count, file_count, dtype=np.int64)
+
+    # Best matches of each file so far, ranked by result and then by the lowest source ID
+    if self.top_k is not None:
+      self.top_results = np.full((file_count, self.top_k), -np.inf)
+      self.top_sources = np.full((file_count, self.top_k), file_count, dtype=np.int64)
+
+    # List the members of each group one after the other
+    self.group_sizes = np.bincount(self.file_groups, minlength=self.file_groups.max() + 1 if file_count else 0)
+    self.members = np.argsort(self.file_groups, kind='stable')
+    self.member_starts = np.cumsum(self.group_sizes) - self.group_sizes
+
+    # Identical files match each other fully, while a sparse result leaves blank ones implicit
+    for group in np.flatnonzero(self.group_sizes > 1):
+      if blank is None or duplicate_results[group] > 0:
+        first, second = np.triu_indices(self.group_sizes[group], 1)
+        group_members = self.members[self.member_starts[group]:self.member_starts[group] + self.group_sizes[group]]
+        self.add_pairs(group_members[first], group_members[second], np.full(len(first), duplicate_results[group]))
+
+  def filename_column(self, ids):
+    return pd.Categorical.from_codes(ids, categories=self.filenames)
+
+  def add(self, submitted, source, results):
+    '''
+    To fan a chunk of representative pairs out to every pair of members of their groups
+    '''
+    submitted = np.asarray(submitted, dtype=np.int64)
+    source = np.asarray(source, dtype=np.int64)
+    results = np.asarray(results, dtype=np.float64)
+
+    # Each pair of groups stands for the product of their members
+    submitted_sizes, source_sizes = self.group_sizes[submitted], self.group_sizes[source]
+    pair_sizes = submitted_sizes * source_sizes
+    pair_ids = np.repeat(np.arange(len(results)), pair_sizes)
+    offsets = np.arange(len(pair_ids)) - np.repeat(np.cumsum(pair_sizes) - pair_sizes, pair_sizes)
+
+    self.add_pairs(
+      self.members[self.member_starts[submitted[pair_ids]] + offsets // source_sizes[pair_ids]],
+      self.members[self.member_starts[source[pair_ids]] + offsets % source_sizes[pair_ids]],
+      results[pair_ids]
+    )
+
+  def add_pairs(self, submitted, source, results):
+    '''
+    To collect a chunk of pairs of files
+    '''
+    submitted, source = np.minimum(submitted, source), np.maximum(submitted, source)
+
+    for chunk_submitted, chunk_source in [(submitted, source), (source, submitted)]:
+      self.totals += np.bincount(chunk_submitted, weights=results, minlength=len(self.totals))
+      self.counts += np.bincount(chunk_submitted, minlength=len(self.counts))
+      self.update_best_matches(chunk_submitted, chunk_source, results)
+      if self.top_k is not None:
+        self.update_top_matches(chunk_submitted, chunk_source, results)
+
+    if self.keep_pairs:
+      self.submitted.append(submitted)
+      self.source.append(source)
+      self.results.append(results)
+
+    if self.log_writer is not None and len(results):
+      self.log_writer.write(PlagiarismResults(self.filenames, submitted, source, results).to_logs())
+
+  def update_best_matches(self, submitted, source, results):
+    '''
+    To merge the best match of each file within the chunk into its best match so far
+    '''
+    file_count = len(self.filenames)
+    chunk_results = np.full(file_count, -np.inf)
+    np.maximum.at(chunk_results, submitted, results)
+
+    # Break ties in favour of the source file with the lowest ID
+    chunk_sources = np.full(file_count, file_count, dtype=np.int64)
+    is_best = results == chunk_results[submitted]
+    np.minimum.at(chunk_sources, submitted[is_best], source[is_best])
+
+    better = (chunk_results > self.best_results) | ((chunk_results == self.best_results) & (chunk_sources < self.best_sources))
+    self.best_results[better] = chunk_results[better]
+    self.best_sources[better] = chunk_sources[better]
+
+  def update_top_matches(self, submitted, source, results):
+    '''
+    To merge the top-k matches of each file within the chunk into its top-k matches so far
+    '''
+    # Rank the matches of each file within the chunk
+    order = np.lexsort((source, -results, submitted))
+    submitted, source, results = submitted[order], source[order], results[order]
+    ranks = np.arange(len(submitted)) - np.searchsorted(submitted, submitted, side='left')
+    kept = ranks < self.top_k
+
+    rows = np.unique(submitted[kept])
+    chunk_results = np.full((len(rows), self.top_k), -np.inf)
+    chunk_sources = np.full((len(rows), self.top_k), len(self.filenames), dtype=np.int64)
+    row_positions = np.searchsorted(rows, submitted[kept])
+    chunk_results[row_positions, ranks[kept]] = results[kept]
+    chunk_sources[row_positions, ranks[kept]] = source[kept]
+
+    # Keep the best of the matches so far and those of the chunk
+    merged_results = np.concatenate((self.top_results[rows], chunk_results), axis=1)
+    merged_sources = np.concatenate((self.top_sources[rows], chunk_sources), axis=1)
+    order = np.lexsort((merged_sources, -merged_results), axis=1)[:, :self.top_k]
+    self.top_results[rows] = np.take_along_axis(merged_results, order, axis=1)
+    self.top_sources[rows] = np.take_along_axis(merged_sources, order, axis=1)
+
+  def score_unstored_pairs(self, totals, counts, best_sources, best_results):
+    '''
+    To account for the pairs a sparse result leaves implicit
+    '''
+    file_count = len(self.filenames)
+    ids = np.arange(file_count)
+    nonblank_ids = np.flatnonzero(~self.blank)
+
+    # Each pair with a blank file scores -1 and every other unstored pair scores 0
+    totals -= np.where(self.blank, file_count - 1, len(self.filenames) - len(nonblank_ids))
+    counts[:] = file_count - 1
+
+    # Files without a stored match take the lowest ID they score 0 (or else -1) against
+    unmatched = best_results == -np.inf
+    lowest_other = np.where(ids == 0, 1, 0)
+    scores_zero = ~self.blank & (len(nonblank_ids) > 1)
+    if len(nonblank_ids) > 1:
+      lowest_nonblank_other = np.where(ids == nonblank_ids[0], nonblank_ids[1], nonblank_ids[0])
+    else:
+      lowest_nonblank_other = lowest_other
+
+    best_results[unmatched] = np.where(scores_zero, 0.0, -1.0)[unmatched]
+    best_sources[unmatched] = np.where(scores_zero, lowest_nonblank_other, lowest_other)[unmatched]
+
+  def file_scores(self):
+    '''
+    To compute the originality score and best match of every file from the running totals
+    '''
+    totals, counts = self.totals.copy(), self.counts.copy()
+    best_sources, best_results = self.best_sources.copy(), self.best_results.copy()
+
+    if self.blank is not None:
+      self.score_unstored_pairs(totals, counts, best_sources, best_results)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+      originality_scores = np.round((100 - totals / counts) / 10, 2)
+
+    return originality_scores, best_sources, best_results, counts
+
+  def to_report(self):
+    '''
+    To extract the report of the best match of each file
+    '''
+    originality_scores, best_sources, best_results, counts = self.file_scores()
+
+    # Arrange the compared files by name before ranking them
+    ids = np.flatnonzero(counts)
+    ids = ids[np.argsort(self.filenames[ids], kind='stable')]
+
+    report = pd.DataFrame({
+      'Submitted_Code': self.filename_column(ids),
+      'Originality_Score': originality_scores[ids],
+      'Source_Code': self.filename_column(best_sources[ids]),
+      'Plagiarism(%)': best_results[ids]
+    })
+
+    return report.sort_values(by=['Plagiarism(%)'], ascending=False).reset_index(drop=True)
+
+  def to_results(self):
+    '''
+    To gather the collected pairs in the order the double loop over the files would produce them
+    '''
+    submitted = np.concatenate(self.submitted) if self.submitted else np.array([], dtype=np.int64)
+    source = np.concatenate(self.source) if self.source else np.array([], dtype=np.int64)
+    results = np.concatenate(self.results) if self.results else np.array([], dtype=np.float64)
+
+    order = np.lexsort((source, submitted))
+    return PlagiarismResults(self.filenames, submitted[order], source[order], results[order], blank=self.blank)
+
+  def to_logs(self):
+    '''
+    To expose the kept logs through pandas, or None when no logs were kept
+    '''
+    if self.keep_pairs:
+      return self.to_results().to_logs()
+    elif self.top_k is None:
+      return None
+
+    submitted = np.repeat(np.arange(len(self.filenames)), self.top_k)
+    kept = self.top_results.ravel() > -np.inf
+
+    return pd.DataFrame({
+      'Submitted_Code': self.filename_column(submitted[kept]),
+      'Source_Code': self.filename_column(self.top_sources.ravel()[kept]),
+      'Plagiarism(%)': self.top_results.ravel()[kept]
+    })
+
+  def summarize(self):
+    '''
+    To produce the kept logs, report and insights of the collected batch
+    '''
+    plagiarism_report = self.to_report()
+    insights = fetch_insights(plagiarism_report['Plagiarism(%)'].to_numpy())
+    return self.to_logs(), plagiarism_report, insights
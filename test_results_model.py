@@ -0,0 +1,128 @@
+# Checks the vectorised results model against the pandas groupby logic of the original report
+import numpy as np
+import pandas as pd
+
+from results_model import ResultsCollector
+
+RESULT_VALUES = [0.0, 12.5, 25.0, 50.0, 100.0]
+
+
+def build_batch(rng, group_count, blank_count, file_count):
+  '''
+  To draw the pair results of a batch of groups, some blank, and spread its files over the groups
+  '''
+  blank = np.zeros(group_count, dtype=bool)
+  blank[rng.choice(group_count, blank_count, replace=False)] = True
+
+  group_results = rng.choice(RESULT_VALUES, size=(group_count, group_count))
+  group_results = np.triu(group_results, 1) + np.triu(group_results, 1).T
+  group_results[blank, :] = group_results[:, blank] = -1
+
+  file_groups = np.concatenate((np.arange(group_count), rng.integers(0, group_count, file_count - group_count)))
+  rng.shuffle(file_groups)
+  duplicate_results = np.where(blank, -1.0, 100.0)
+
+  file_results = group_results[np.ix_(file_groups, file_groups)]
+  same_group = file_groups[:, None] == file_groups[None, :]
+  file_results[same_group] = duplicate_results[file_groups[np.nonzero(same_group)[0]]]
+
+  filenames = [f'file_{i:02d}.py' for i in rng.permutation(file_count)]
+  return filenames, group_results, blank, file_groups, duplicate_results, file_results
+
+
+def reference_logs(filenames, file_results):
+  '''
+  To build the logs as the original double loop over the files did
+  '''
+  data = []
+  for i in range(len(filenames)):
+    for j in range(i+1, len(filenames)):
+      data.append([filenames[i], filenames[j], file_results[i, j]])
+      data.append([filenames[j], filenames[i], file_results[i, j]])
+
+  return pd.DataFrame(data, columns=['Submitted_Code', 'Source_Code', 'Plagiarism(%)'])
+
+
+def reference_report(plagiarism_logs):
+  '''
+  To score the files as the original generate_batch_report and batch_originality_scores did
+  '''
+  plagiarism_report = plagiarism_logs.loc[plagiarism_logs.groupby(['Submitted_Code'], sort=True)['Plagiarism(%)'].idxmax()]
+  grouped_logs = plagiarism_logs.groupby('Submitted_Code')['Plagiarism(%)'].mean()
+  originality_df = pd.DataFrame(zip(grouped_logs.index, round((100 - grouped_logs) / 10, 2)), columns=['Submitted_Code', 'Originality_Score'])
+  return pd.merge(plagiarism_report, originality_df, left_on='Submitted_Code', right_on='Submitted_Code')
+
+
+def report_rows(plagiarism_report):
+  rows = plagiarism_report[['Submitted_Code', 'Originality_Score', 'Source_Code', 'Plagiarism(%)']].astype({'Submitted_Code': str, 'Source_Code': str})
+  return sorted(map(tuple, rows.to_numpy().tolist()))
+
+
+def collect(rng, filenames, group_results, file_groups=None, duplicate_results=None, blank=None, top_k=None):
+  '''
+  To feed the pairs of groups to a collector in shuffled chunks, leaving out the implicit ones of a sparse batch
+  '''
+  submitted, source = np.triu_indices(len(group_results), 1)
+  results = group_results[submitted, source]
+  if blank is not None:
+    stored = results > 0
+    submitted, source, results = submitted[stored], source[stored], results[stored]
+
+  order = rng.permutation(len(results))
+  collector = ResultsCollector(filenames, file_groups, duplicate_results, blank, top_k=top_k)
+  for chunk in np.array_split(order, 5):
+    collector.add(submitted[chunk], source[chunk], results[chunk])
+
+  return collector.summarize()
+
+
+def check_batch(seed, sparse, top_k=None):
+  rng = np.random.default_rng(seed)
+  filenames, group_results, blank, file_groups, duplicate_results, file_results = build_batch(rng, 9, 2, 14)
+  expected_logs = reference_logs(filenames, file_results)
+
+  plagiarism_logs, plagiarism_report, insights = collect(rng, filenames, group_results, file_groups, duplicate_results, blank if sparse else None, top_k)
+
+  # The best match of each file goes to the lowest file ID among ties, as idxmax does over the logs
+  assert report_rows(plagiarism_report) == report_rows(reference_report(expected_logs))
+  assert (np.diff(plagiarism_report['Plagiarism(%)'].to_numpy()) <= 0).all()
+  assert insights['mean'] == round(plagiarism_report['Plagiarism(%)'].mean(), 2)
+
+  if top_k is None:
+    assert plagiarism_logs.astype(str).equals(expected_logs.astype(str))
+  else:
+    # Each file keeps its top-k matches, ranked by result and then by the lowest source ID
+    ids = {filename: i for i, filename in enumerate(filenames)}
+    expected_logs['Submitted_ID'] = expected_logs['Submitted_Code'].map(ids)
+    expected_logs['Source_ID'] = expected_logs['Source_Code'].map(ids)
+    expected_logs = expected_logs.sort_values(['Submitted_ID', 'Plagiarism(%)', 'Source_ID'], ascending=[True, False, True])
+    if sparse:
+      expected_logs = expected_logs[expected_logs['Plagiarism(%)'] > 0]
+    expected_logs = expected_logs.groupby('Submitted_ID').head(top_k)[['Submitted_Code', 'Source_Code', 'Plagiarism(%)']]
+    assert plagiarism_logs.astype(str).reset_index(drop=True).equals(expected_logs.astype(str).reset_index(drop=True))
+
+
+def test_dense_collector_matches_original_report():
+  for seed in range(20):
+    check_batch(seed, sparse=False)
+
+
+def test_sparse_collector_matches_original_report():
+  for seed in range(20):
+    check_batch(seed, sparse=True)
+
+
+def test_top_k_collector_matches_original_ranking():
+  for seed in range(20):
+    check_batch(seed, sparse=False, top_k=3)
+    check_batch(seed, sparse=True, top_k=2)
+
+
+def test_collector_without_duplicates():
+  rng = np.random.default_rng(0)
+  filenames, group_results, blank, _, _, _ = build_batch(rng, 10, 1, 10)
+  expected_logs = reference_logs(filenames, group_results)
+
+  plagiarism_logs, plagiarism_report, _ = collect(rng, filenames, group_results)
+  assert plagiarism_logs.astype(str).equals(expected_logs.astype(str))
+  assert report_rows(plagiarism_report) == report_rows(reference_report(expected_logs))
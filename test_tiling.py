@@ -0,0 +1,36 @@
+# Checks that tiled comparisons match the serial one, including several batches in one process
+import os
+
+import engine
+
+SNIPPETS = [
+  'def total(items):\n  result = 0\n  for item in items:\n    result += item\n  return result\n',
+  'def total(values):\n  count = 0\n  for value in values:\n    count += value\n  return count\n',
+  'def largest(items):\n  best = items[0]\n  for item in items:\n    if item > best:\n      best = item\n  return best\n',
+  'def mean(items):\n  return sum(items) / len(items)\n',
+  'def reverse(text):\n  return text[::-1]\n',
+  'def is_even(number):\n  return number % 2 == 0\n',
+  'def squares(limit):\n  return [i * i for i in range(limit)]\n',
+]
+
+
+def write_batch(path, snippets):
+  os.makedirs(path)
+  for i, snippet in enumerate(snippets):
+    with open(os.path.join(path, f'file_{i}.py'), 'w', encoding='utf8') as f:
+      f.write(snippet)
+  return str(path)
+
+
+def test_tiled_batches_in_one_process(tmp_path):
+  small_batch = write_batch(tmp_path / 'small', SNIPPETS[:3])
+  large_batch = write_batch(tmp_path / 'large', SNIPPETS[2:] + SNIPPETS[:2])
+
+  # Each checkpointed run must use its own fingerprints, whichever batch ran before it
+  for first, second in [(small_batch, large_batch), (large_batch, small_batch)]:
+    engine.trigger_moss(first, workers=1, checkpoint_path=str(tmp_path / 'first'))
+    tiled_logs, tiled_report, _ = engine.trigger_moss(second, workers=1, checkpoint_path=str(tmp_path / 'second'), tile_size=2)
+    serial_logs, serial_report, _ = engine.trigger_moss(second, workers=1)
+
+    assert tiled_logs.astype(str).equals(serial_logs.astype(str))
+    assert tiled_report.astype(str).equals(serial_report.astype(str))
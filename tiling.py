@@ -0,0 +1,233 @@
+# Splits the file x file comparison matrix into tiles that independent workers can process
+import os
+import sys
+import json
+import pickle
+import hashlib as hl
+import numpy as np
+from tqdm import tqdm
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import engine
+
+MANIFEST_FILENAME = 'manifest.json'
+FINGERPRINTS_FILENAME = 'fingerprints.pkl'
+
+# Fingerprints loaded once per pool worker process by its initializer
+_worker_fingerprints = None
+
+
+def plan_tiles(file_count, tile_size=256):
+  '''
+  To partition the upper triangle of the comparison matrix into square tiles
+  '''
+  tiles = []
+  starts = list(range(0, file_count, tile_size))
+
+  for row_start in starts:
+    for col_start in starts:
+
+      # The lower triangle mirrors the upper one
+      if col_start < row_start:
+        continue
+
+      tiles.append({
+        'tile_id': len(tiles),
+        'rows': [row_start, min(row_start + tile_size, file_count)],
+        'cols': [col_start, min(col_start + tile_size, file_count)]
+      })
+
+  return tiles
+
+
+def tile_checkpoint_path(checkpoint_path, tile):
+  return os.path.join(checkpoint_path, f"tile_{tile['tile_id']:06d}.npz")
+
+
+def fingerprint_signature(filenames, fingerprints):
+  '''
+  To digest the batch so that checkpoints of a different batch are never reused
+  '''
+  digest = hl.sha1()
+  for filename in filenames:
+    digest.update(filename.encode('utf-8'))
+    digest.update(pickle.dumps(fingerprints[filename]))
+  return digest.hexdigest()
+
+
+def prepare_checkpoint(checkpoint_path, filenames, fingerprints, tile_size=256):
+  '''
+  To write the tile manifest and the fingerprints shared by all workers
+  '''
+  os.makedirs(checkpoint_path, exist_ok=True)
+  manifest_path = os.path.join(checkpoint_path, MANIFEST_FILENAME)
+  signature = fingerprint_signature(filenames, fingerprints)
+
+  # Resume from an earlier run of the same batch
+  if os.path.exists(manifest_path):
+    with open(manifest_path, encoding='utf8') as f:
+      manifest = json.load(f)
+
+    if manifest['signature'] == signature and manifest['tile_size'] == tile_size:
+      return manifest
+
+    # Discard the results of a different batch
+    for tile in manifest['tiles']:
+      if os.path.exists(tile_checkpoint_path(checkpoint_path, tile)):
+        os.remove(tile_checkpoint_path(checkpoint_path, tile))
+
+  manifest = {
+    'signature': signature,
+    'tile_size': tile_size,
+    'filenames': filenames,
+    'tiles': plan_tiles(len(filenames), tile_size)
+  }
+
+  with open(os.path.join(checkpoint_path, FINGERPRINTS_FILENAME), 'wb') as f:
+    pickle.dump([fingerprints[filename] for filename in filenames], f)
+
+  # The manifest is written last so that it only ever points to complete inputs
+  with open(manifest_path + '.tmp', 'w', encoding='utf8') as f:
+    json.dump(manifest, f)
+  os.replace(manifest_path + '.tmp', manifest_path)
+
+  return manifest
+
+
+def load_manifest(checkpoint_path):
+  with open(os.path.join(checkpoint_path, MANIFEST_FILENAME), encoding='utf8') as f:
+    return json.load(f)
+
+
+def pending_tiles(checkpoint_path, tiles):
+  '''
+  To list the tiles whose results have not been checkpointed yet
+  '''
+  return [tile for tile in tiles if not os.path.exists(tile_checkpoint_path(checkpoint_path, tile))]
+
+
+def load_fingerprints(checkpoint_path):
+  with open(os.path.join(checkpoint_path, FINGERPRINTS_FILENAME), 'rb') as f:
+    return pickle.load(f)
+
+
+def load_worker_fingerprints(checkpoint_path):
+  global _worker_fingerprints
+  _worker_fingerprints = load_fingerprints(checkpoint_path)
+
+
+def compare_tile(tile, fingerprints):
+  '''
+  To compare every pair of files (i < j) that falls inside the given tile
+  '''
+  submitted, source, results = [], [], []
+
+  for i in range(*tile['rows']):
+    for j in range(max(i + 1, tile['cols'][0]), tile['cols'][1]):
+      submitted.append(i)
+      source.append(j)
+      results.append(engine.check_for_plagiarism(i, j, fingerprints[i], fingerprints[j]))
+
+  return np.array(submitted, dtype=np.int64), np.array(source, dtype=np.int64), np.array(results, dtype=np.float64)
+
+
+def process_tile(checkpoint_path, tile, fingerprints=None):
+  '''
+  To compare a tile and checkpoint its results
+
+  Pool workers leave out the fingerprints, which their initializer loaded for this checkpoint.
+  '''
+  submitted, source, results = compare_tile(tile, _worker_fingerprints if fingerprints is None else fingerprints)
+
+  # Write to a temporary file first so that a killed worker never leaves a partial tile behind
+  target_path = tile_checkpoint_path(checkpoint_path, tile)
+  with open(target_path + '.tmp', 'wb') as f:
+    np.savez(f, submitted=submitted, source=source, results=results)
+  os.replace(target_path + '.tmp', target_path)
+
+  return tile['tile_id']
+
+
+def run_tiles(checkpoint_path, tiles, workers=None, on_tile=None):
+  '''
+  To process the given tiles on a local pool of worker processes
+  '''
+  if not tiles:
+    return
+
+  workers = workers or os.cpu_count() or 1
+
+  # Load the fingerprints of this checkpoint for every call, as the process may run several batches
+  if workers == 1:
+    fingerprints = load_fingerprints(checkpoint_path)
+    for tile in tqdm(tiles):
+      process_tile(checkpoint_path, tile, fingerprints)
+      if on_tile is not None:
+        on_tile(tile)
+    return
+
+  with ProcessPoolExecutor(max_workers=workers, initializer=load_worker_fingerprints, initargs=(checkpoint_path,)) as executor:
+    futures = {executor.submit(process_tile, checkpoint_path, tile): tile for tile in tiles}
+    for future in tqdm(as_completed(futures), total=len(futures)):
+      future.result()
+      if on_tile is not None:
+        on_tile(futures[future])
+
+
+def load_tile(checkpoint_path, tile):
+  with np.load(tile_checkpoint_path(checkpoint_path, tile)) as checkpoint:
+    return checkpoint['submitted'], checkpoint['source'], checkpoint['results']
+
+
+def remove_checkpoint(checkpoint_path, manifest):
+  '''
+  To delete the tiles, fingerprints and manifest of a collected checkpoint
+  '''
+  for tile in manifest['tiles']:
+    if os.path.exists(tile_checkpoint_path(checkpoint_path, tile)):
+      os.remove(tile_checkpoint_path(checkpoint_path, tile))
+
+  for filename in [FINGERPRINTS_FILENAME, MANIFEST_FILENAME]:
+    if os.path.exists(os.path.join(checkpoint_path, filename)):
+      os.remove(os.path.join(checkpoint_path, filename))
+
+  # Leave the directory in place if anything else was stored in it
+  if not os.listdir(checkpoint_path):
+    os.rmdir(checkpoint_path)
+
+
+def generate_tiled_batch_report(filenames, file_count, fingerprints, checkpoint_path, workers=None, tile_size=256, collector=None, keep_checkpoints=False):
+  '''
+  To compare the batch tile by tile, resuming from any tiles finished earlier
+
+  The checkpoint is deleted once every tile is collected, unless keep_checkpoints is set.
+  '''
+  collector = collector or engine.ResultsCollector(filenames)
+  manifest = prepare_checkpoint(checkpoint_path, filenames, fingerprints, tile_size)
+  tiles = pending_tiles(checkpoint_path, manifest['tiles'])
+  print(f"Comparing {len(tiles)} of {len(manifest['tiles'])} tiles ({len(manifest['tiles']) - len(tiles)} resumed from {checkpoint_path})")
+
+  # Collect each tile as soon as it is available, starting with the resumed ones
+  on_tile = lambda tile: collector.add(*load_tile(checkpoint_path, tile))
+  pending_ids = set(tile['tile_id'] for tile in tiles)
+  for tile in manifest['tiles']:
+    if tile['tile_id'] not in pending_ids:
+      on_tile(tile)
+
+  run_tiles(checkpoint_path, tiles, workers, on_tile)
+
+  if not keep_checkpoints:
+    remove_checkpoint(checkpoint_path, manifest)
+
+  return collector
+
+
+if __name__ == '__main__':
+  # Process a share of the tiles on this node: python tiling.py <checkpoint_path> [node_index node_count]
+  checkpoint_path = sys.argv[1]
+  node_index, node_count = (int(sys.argv[2]), int(sys.argv[3])) if len(sys.argv) > 3 else (0, 1)
+
+  manifest = load_manifest(checkpoint_path)
+  tiles = [tile for tile in pending_tiles(checkpoint_path, manifest['tiles']) if tile['tile_id'] % node_count == node_index]
+  print(f'Processing {len(tiles)} tiles on node {node_index} of {node_count}')
+  run_tiles(checkpoint_path, tiles)